@@ -16,6 +16,7 @@ from selenium.webdriver.support.expected_conditions import (
 from selenium.webdriver.support.ui import Select, WebDriverWait
 
 from configs import SETTINGS
+from helpers.rate_limit_helper import LIMITER
 
 
 class BotHelper:
@@ -307,6 +308,9 @@ class BotHelper:
     def visit(self, url: str) -> None:
         """Visits the specified URL.
 
+        The visit goes through the shared rate limiter, and timeouts or error
+        pages make the limiter back off.
+
         Args:
             url (str): The URL to visit.
 
@@ -314,8 +318,15 @@ class BotHelper:
             None
         """
         logging.debug(f"Visiting URL: {url}")
-        self.driver.get(url)
-        self.wait_page_until_loading()
+        with LIMITER.throttle() as request:
+            self.driver.get(url)
+            self.wait_page_until_loading()
+            title = self.driver.title
+            request.ok = not any(
+                marker in title for marker in SETTINGS.rate_limit.error_markers
+            )
+        if not request.ok:
+            logging.error(f"Error page returned for {url}: {title}")
 
     def click(self, locator: tuple[By, str], message: str = "") -> None:
         """Clicks the specified element.
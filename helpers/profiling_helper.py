@@ -0,0 +1,309 @@
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Iterator
+
+from configs import REPORT_DIR, SETTINGS
+from helpers.bot_helper import BotHelper
+
+# Before 3.12 cProfile only records the thread that enabled it. From 3.12 it
+# runs on sys.monitoring, which sees every thread but allows one profiler.
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float, idents: set[int]):
+        self._interval = interval
+        self._idents = idents
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """
+        Starts sampling in the background.
+
+        Only threads whose ident is in idents are sampled. The set may change
+        while sampling, so threads can join and leave as they start and finish
+        crawling.
+
+        Returns:
+            None
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the background sampling thread.
+
+        Returns:
+            None
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or ident not in self._idents:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                        f":{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: str) -> None:
+        """
+        Writes the collected samples in collapsed stack format.
+
+        The output can be fed to flamegraph.pl, speedscope or inferno as is.
+
+        Args:
+            path (str): The path to write the folded stacks to.
+
+        Returns:
+            None
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self._stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+    def summary(self, top_n: int) -> str:
+        """
+        Returns the top-N hot functions by self and total samples.
+
+        Args:
+            top_n (int): The number of functions to list.
+
+        Returns:
+            str: The formatted summary.
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+
+        samples = sum(self._stacks.values()) or 1
+        lines = [f"{'self %':>8} {'total %':>8}  function"]
+        for frame, count in own.most_common(top_n):
+            lines.append(
+                f"{count / samples:>8.1%} {total[frame] / samples:>8.1%}  {frame}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+class ProfilerHelper:
+    def __init__(self):
+        self._settings = SETTINGS.profiling
+        self.enabled = bool(self._settings.enabled)
+        self._runtime = time.strftime("%Y-%m-%d_%H-%M-%S")
+        self._spans = []
+        self._spans_lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._run_ident = None
+        self._worker_profiles = None
+        self._crawl_idents = None
+        self._deterministic_lock = threading.Lock()
+
+        if self.enabled:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+
+    def run(self) -> contextlib.AbstractContextManager:
+        """
+        Profiles the whole crawl run unless specific products are selected.
+
+        Returns:
+            contextlib.AbstractContextManager: The profiling context.
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._run()
+
+    def product(self, url: str) -> contextlib.AbstractContextManager:
+        """
+        Profiles a single product if it is selected in the profiling settings.
+
+        While a whole-run profile is active, the calling thread is registered
+        for sampling, and on Python < 3.12 a deterministic profile of worker
+        threads is merged into the run profile.
+
+        Args:
+            url (str): The URL of the product being crawled.
+
+        Returns:
+            contextlib.AbstractContextManager: The profiling context.
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        if url in self._settings.urls:
+            return self._profile(
+                url.rstrip("/").split("/")[-1], idents={threading.get_ident()}
+            )
+        if self._crawl_idents is not None:
+            return self._profile_crawl()
+        return contextlib.nullcontext()
+
+    def trace(self, bot: BotHelper) -> BotHelper:
+        """
+        Wraps the public methods of the given bot with tracing spans.
+
+        The bot is returned untouched when profiling or tracing is disabled.
+
+        Args:
+            bot (BotHelper): The bot to trace.
+
+        Returns:
+            BotHelper: The same bot instance.
+        """
+        if not self.enabled or not self._settings.trace:
+            return bot
+
+        for name in dir(bot):
+            method = getattr(bot, name)
+            if name.startswith("_") or not callable(method):
+                continue
+            setattr(bot, name, self._span(f"BotHelper.{name}", method))
+        return bot
+
+    def _span(self, name: str, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                with self._spans_lock:
+                    self._spans.append(
+                        {
+                            "name": name,
+                            "ph": "X",
+                            "ts": (start - self._origin) * 1e6,
+                            "dur": (end - start) * 1e6,
+                            "pid": os.getpid(),
+                            "tid": threading.get_ident(),
+                        }
+                    )
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def _run(self) -> Iterator[None]:
+        try:
+            if self._settings.urls:
+                yield
+            else:
+                self._crawl_idents = set()
+                with self._profile("run", idents=self._crawl_idents, workers=True):
+                    yield
+        finally:
+            self._crawl_idents = None
+            self._write_spans()
+
+    @contextlib.contextmanager
+    def _profile_crawl(self) -> Iterator[None]:
+        ident = threading.get_ident()
+        self._crawl_idents.add(ident)
+        profiler = None
+        if self._worker_profiles is not None and ident != self._run_ident:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+                with self._spans_lock:
+                    self._worker_profiles.append(profiler)
+            self._crawl_idents.discard(ident)
+
+    @contextlib.contextmanager
+    def _profile(
+        self, label: str, idents: set[int], workers: bool = False
+    ) -> Iterator[None]:
+        prefix = os.path.join(
+            REPORT_DIR,
+            f"profile_{self._runtime}_{re.sub(r'[^A-Za-z0-9_.-]', '_', label)}",
+        )
+        top_n = self._settings.top_n
+
+        if self._settings.mode == "deterministic":
+            if not PER_THREAD_PROFILES and not self._deterministic_lock.acquire(
+                blocking=False
+            ):
+                logging.warning(
+                    f"Skipping profile {label}: another deterministic profile "
+                    "is already active"
+                )
+                yield
+                return
+
+            workers = workers and PER_THREAD_PROFILES
+            profiler = cProfile.Profile()
+            if workers:
+                self._run_ident = threading.get_ident()
+                self._worker_profiles = []
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                if not PER_THREAD_PROFILES:
+                    self._deterministic_lock.release()
+                stream = io.StringIO()
+                stats = pstats.Stats(profiler, stream=stream)
+                if workers:
+                    for worker_profile in self._worker_profiles:
+                        stats.add(worker_profile)
+                    self._worker_profiles = None
+                stats.dump_stats(f"{prefix}.prof")
+                stream.write("Hot functions by own time\n")
+                stats.sort_stats(pstats.SortKey.TIME).print_stats(top_n)
+                stream.write("Hot call paths by cumulative time\n")
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+                self._write_summary(prefix, stream.getvalue())
+        elif self._settings.mode == "sampling":
+            profiler = SamplingProfiler(self._settings.interval, idents)
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                profiler.write_folded(f"{prefix}.folded")
+                self._write_summary(prefix, profiler.summary(top_n))
+        else:
+            raise ValueError(f"Unsupported profiling mode: {self._settings.mode}")
+
+    def _write_summary(self, prefix: str, summary: str) -> None:
+        with open(f"{prefix}_top.txt", "w", encoding="utf-8") as file:
+            file.write(summary)
+        logging.info(f"Profile written to {prefix}.*")
+        logging.debug(f"Hot functions:\n{summary}")
+
+    def _write_spans(self) -> None:
+        if not self._spans:
+            return
+        path = os.path.join(REPORT_DIR, f"trace_{self._runtime}.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self._spans}, file)
+        logging.info(f"Trace spans written to {path}")
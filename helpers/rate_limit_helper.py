@@ -0,0 +1,247 @@
+import contextlib
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterator
+
+from configs import REPORT_DIR, SETTINGS
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no fcntl
+    fcntl = None
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        path: str,
+        burst: float,
+        min_rate: float,
+        max_rate: float,
+        reset_after: float,
+    ):
+        self._path = path
+        self._burst = burst
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._reset_after = reset_after
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks until a token is available in the shared bucket.
+
+        The bucket state, including its refill rate, lives in a file guarded by
+        an exclusive lock, so every thread and process pointing at the same file
+        shares one budget and one rate. A bucket left idle for reset_after
+        seconds starts again from a full budget at max_rate, so a backoff does
+        not carry over into the next scheduled run.
+
+        Returns:
+            None
+        """
+        while True:
+            with self._state() as state:
+                if state["tokens"] >= 1:
+                    state["tokens"] -= 1
+                    return
+                wait = (1 - state["tokens"]) / state["rate"]
+            time.sleep(wait)
+
+    def update_rate(self, update: Callable[[float], float]) -> float:
+        """
+        Replaces the shared refill rate with the result of the given update.
+
+        Args:
+            update (Callable[[float], float]): Maps the current rate to the new one.
+
+        Returns:
+            float: The new shared rate.
+        """
+        with self._state() as state:
+            state["rate"] = self._clamp(update(state["rate"]))
+            return state["rate"]
+
+    @contextlib.contextmanager
+    def _state(self) -> Iterator[dict]:
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        with self._lock, open(self._path, "a+", encoding="utf-8") as file:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                state = self._read(file, now)
+                state["tokens"] = min(
+                    self._burst,
+                    state["tokens"] + (now - state["updated"]) * state["rate"],
+                )
+                state["updated"] = now
+                yield state
+                self._write(file, state)
+            finally:
+                if fcntl:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _read(self, file, now: float) -> dict:
+        file.seek(0)
+        try:
+            state = json.loads(file.read())
+        except ValueError:
+            state = None
+        if (
+            not isinstance(state, dict)
+            or not all(
+                isinstance(state.get(key), (int, float))
+                for key in ("tokens", "updated", "rate")
+            )
+            or now - state["updated"] > self._reset_after
+        ):
+            logging.debug(f"Resetting rate limit state: {self._path}")
+            return {"tokens": self._burst, "updated": now, "rate": self._max_rate}
+        state["rate"] = self._clamp(state["rate"])
+        return state
+
+    def _clamp(self, rate: float) -> float:
+        return float(min(self._max_rate, max(self._min_rate, rate)))
+
+    def _write(self, file, state: dict) -> None:
+        file.seek(0)
+        file.truncate()
+        file.write(json.dumps(state))
+        file.flush()
+
+
+class Request:
+    def __init__(self):
+        self.ok = True
+
+
+class RateLimiter:
+    def __init__(self):
+        self._settings = SETTINGS.rate_limit
+        self._bucket = TokenBucket(
+            os.path.join(REPORT_DIR, self._settings.state_file),
+            self._settings.burst,
+            self._settings.min_rate,
+            self._settings.max_rate,
+            self._settings.reset_after,
+        )
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._limit = float(self._settings.min_concurrency)
+        self._rate = float(self._settings.max_rate)
+        self._last_backoff = 0.0
+        self._export_lock = threading.Lock()
+        self._export_started = False
+        self._export_path = os.path.join(
+            REPORT_DIR, f"rate_limit_{time.strftime('%Y-%m-%d_%H-%M-%S')}.csv"
+        )
+
+    @property
+    def concurrency(self) -> int:
+        return int(self._limit)
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Holds one of the worker slots allowed by the adaptive concurrency limit.
+
+        Returns:
+            Iterator[None]: The slot context.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def throttle(self) -> Iterator[Request]:
+        """
+        Waits for a token before a request and feeds its outcome back.
+
+        The caller marks the yielded request as failed on error pages; raised
+        exceptions, such as timeouts, count as failures as well.
+
+        Returns:
+            Iterator[Request]: The request whose outcome is recorded.
+        """
+        self._bucket.acquire()
+        request = Request()
+        start = time.monotonic()
+        try:
+            yield request
+        except Exception:
+            request.ok = False
+            raise
+        finally:
+            self._record(time.monotonic() - start, request.ok)
+
+    def _record(self, latency: float, ok: bool) -> None:
+        settings = self._settings
+        healthy = ok and latency <= settings.target_latency
+        with self._condition:
+            now = time.monotonic()
+            backoff = not healthy and now - self._last_backoff >= settings.cooldown
+            if healthy:
+                self._limit = min(
+                    settings.max_concurrency,
+                    self._limit + settings.increase_step / self._limit,
+                )
+            elif backoff:
+                self._last_backoff = now
+                self._limit = max(
+                    settings.min_concurrency, self._limit * settings.backoff_factor
+                )
+            self._condition.notify_all()
+            concurrency, in_flight = self.concurrency, self._in_flight
+
+        if healthy:
+            self._rate = self._bucket.update_rate(lambda rate: rate + settings.rate_step)
+        elif backoff:
+            self._rate = self._bucket.update_rate(
+                lambda rate: rate * settings.backoff_factor
+            )
+            logging.warning(
+                f"Backing off to concurrency {concurrency}, rate {self._rate:.2f}/s"
+            )
+        self._export(concurrency, in_flight, latency, ok)
+
+    def _export(
+        self, concurrency: int, in_flight: int, latency: float, ok: bool
+    ) -> None:
+        with self._export_lock:
+            if not self._export_started:
+                os.makedirs(REPORT_DIR, exist_ok=True)
+            with open(self._export_path, "a", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                if not self._export_started:
+                    writer.writerow(
+                        ["time", "concurrency", "rate", "in_flight", "latency", "ok"]
+                    )
+                    self._export_started = True
+                writer.writerow(
+                    [
+                        time.strftime("%Y-%m-%d %H:%M:%S"),
+                        concurrency,
+                        round(self._rate, 3),
+                        in_flight,
+                        round(latency, 3),
+                        ok,
+                    ]
+                )
+        logging.debug(
+            f"Concurrency {concurrency}, rate {self._rate:.2f}/s, "
+            f"latency {latency:.3f}s, ok={ok}"
+        )
+
+
+LIMITER = RateLimiter()
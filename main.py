@@ -1,4 +1,6 @@
 import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from configs import SETTINGS
 from elements.product import Product
@@ -6,46 +8,74 @@ from elements.sidebar import Sidebar
 from helpers.bot_helper import BotHelper as bot
 from helpers.driver_helper import DriverHelper
 from helpers.logging_helper import LoggerHelper
+from helpers.profiling_helper import ProfilerHelper
+from helpers.rate_limit_helper import LIMITER
 from helpers.telegram_helper import send
 
 
+def report_stock(driver: bot, url: str):
+    message = ""
+    driver.visit(url)
+
+    product_name = driver.find(Product.NAME)
+    logging.info(f"Product name: {product_name.text}")
+    message += f"{product_name.text} 的庫存狀況：\n"
+
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight*0.2);")
+    driver.wait_element_appear(Product.FIND_IN_STORE_LINK)
+    driver.click(Product.FIND_IN_STORE_LINK)
+    driver.click(Sidebar.STOCK_SELECTOR)
+
+    shops = driver.find_all(Sidebar.SHOP)
+    stocks = driver.find_all(Sidebar.STOCK)
+
+    if len(shops) == len(stocks):
+        for shop, stock in zip(shops, stocks):
+            shop_name = shop.text.strip() or shop.get_attribute("innerText").strip()
+            stock_value = (
+                stock.text.strip() or stock.get_attribute("innerText").strip()
+            )
+            logging.info(f"Shop: {shop_name}, Stock: {stock_value}")
+            if "缺貨" in shop_name:
+                message += f"• {shop_name.split(' ')[1]}：缺貨 QQ\n"
+            else:
+                message += f"• {shop_name}：{stock_value}\n"
+    else:
+        logging.error("Number of shops and stocks do not match!")
+
+    send(message)
+
+
+def crawl(url: str, profiler: ProfilerHelper) -> bool:
+    try:
+        with LIMITER.slot(), profiler.product(url):
+            driver = profiler.trace(bot(DriverHelper().driver))
+            try:
+                report_stock(driver, url)
+            finally:
+                driver.close()
+    except Exception:
+        logging.exception(f"Failed to crawl {url}")
+        return False
+    return True
+
+
 def main():
     LoggerHelper()
+    profiler = ProfilerHelper()
     urls = SETTINGS.urls
-    for url in urls:
-        message = ""
-        driver = bot(DriverHelper().driver)
-        driver.visit(url)
-
-        product_name = driver.find(Product.NAME)
-        logging.info(f"Product name: {product_name.text}")
-        message += f"{product_name.text} 的庫存狀況：\n"
-
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight*0.2);")
-        driver.wait_element_appear(Product.FIND_IN_STORE_LINK)
-        driver.click(Product.FIND_IN_STORE_LINK)
-        driver.click(Sidebar.STOCK_SELECTOR)
-
-        shops = driver.find_all(Sidebar.SHOP)
-        stocks = driver.find_all(Sidebar.STOCK)
-
-        if len(shops) == len(stocks):
-            for shop, stock in zip(shops, stocks):
-                shop_name = shop.text.strip() or shop.get_attribute("innerText").strip()
-                stock_value = (
-                    stock.text.strip() or stock.get_attribute("innerText").strip()
-                )
-                logging.info(f"Shop: {shop_name}, Stock: {stock_value}")
-                if "缺貨" in shop_name:
-                    message += f"• {shop_name.split(' ')[1]}：缺貨 QQ\n"
-                else:
-                    message += f"• {shop_name}：{stock_value}\n"
+    workers = SETTINGS.rate_limit.max_concurrency
+    with profiler.run():
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda url: crawl(url, profiler), urls))
         else:
-            logging.error("Number of shops and stocks do not match!")
-
-        send(message)
+            results = [crawl(url, profiler) for url in urls]
 
-    driver.close()
+    failed = results.count(False)
+    if failed:
+        logging.error(f"{failed} of {len(urls)} products failed")
+        sys.exit(1)
 
 
 if __name__ == "__main__":